@@ -0,0 +1,191 @@
+"""
+Pure python MessagePack and CBOR writers for the values pjo produces
+"""
+import struct
+
+
+class MessagePack:
+    """
+    https://github.com/msgpack/msgpack/blob/master/spec.md
+    """
+
+    @staticmethod
+    def dumps(obj) -> bytes:
+        out = bytearray()
+        MessagePack._pack(obj, out)
+        return bytes(out)
+
+    @staticmethod
+    def _pack(obj, out: bytearray) -> None:
+        if obj is None:
+            out.append(0xC0)
+
+        # bool before int, bool is a subclass of int
+        elif obj is True:
+            out.append(0xC3)
+
+        elif obj is False:
+            out.append(0xC2)
+
+        elif isinstance(obj, int):
+            MessagePack._pack_int(obj, out)
+
+        elif isinstance(obj, float):
+            out += struct.pack(">Bd", 0xCB, obj)
+
+        elif isinstance(obj, str):
+            data = obj.encode("utf-8")
+            n = len(data)
+            if n < 32:
+                out.append(0xA0 | n)
+            elif n < 2**8:
+                out += struct.pack(">BB", 0xD9, n)
+            elif n < 2**16:
+                out += struct.pack(">BH", 0xDA, n)
+            else:
+                out += struct.pack(">BI", 0xDB, n)
+            out += data
+
+        elif isinstance(obj, (bytes, bytearray)):
+            n = len(obj)
+            if n < 2**8:
+                out += struct.pack(">BB", 0xC4, n)
+            elif n < 2**16:
+                out += struct.pack(">BH", 0xC5, n)
+            else:
+                out += struct.pack(">BI", 0xC6, n)
+            out += obj
+
+        elif isinstance(obj, (list, tuple)):
+            MessagePack._pack_length(len(obj), 0x90, 0xDC, out)
+            for e in obj:
+                MessagePack._pack(e, out)
+
+        elif isinstance(obj, dict):
+            MessagePack._pack_length(len(obj), 0x80, 0xDE, out)
+            for (key, value) in obj.items():
+                MessagePack._pack(key, out)
+                MessagePack._pack(value, out)
+
+        else:
+            raise ValueError(f"cannot encode {type(obj)} as MessagePack")
+
+    @staticmethod
+    def _pack_int(n: int, out: bytearray) -> None:
+        if 0 <= n < 2**7:
+            out.append(n)
+        elif -(2**5) <= n < 0:
+            out += struct.pack(">b", n)
+        elif 0 <= n < 2**8:
+            out += struct.pack(">BB", 0xCC, n)
+        elif 0 <= n < 2**16:
+            out += struct.pack(">BH", 0xCD, n)
+        elif 0 <= n < 2**32:
+            out += struct.pack(">BI", 0xCE, n)
+        elif 0 <= n < 2**64:
+            out += struct.pack(">BQ", 0xCF, n)
+        elif n >= 2**64:
+            raise ValueError(f"{n} does not fit in a 64 bit MessagePack int")
+        elif -(2**7) <= n:
+            out += struct.pack(">Bb", 0xD0, n)
+        elif -(2**15) <= n:
+            out += struct.pack(">Bh", 0xD1, n)
+        elif -(2**31) <= n:
+            out += struct.pack(">Bi", 0xD2, n)
+        elif -(2**63) <= n:
+            out += struct.pack(">Bq", 0xD3, n)
+        else:
+            raise ValueError(f"{n} does not fit in a 64 bit MessagePack int")
+
+    @staticmethod
+    def _pack_length(n: int, fix: int, wide: int, out: bytearray) -> None:
+        # arrays and maps: fix* holds up to 15 elements, then 16 or 32 bit lengths
+        if n < 16:
+            out.append(fix | n)
+        elif n < 2**16:
+            out += struct.pack(">BH", wide, n)
+        else:
+            out += struct.pack(">BI", wide + 1, n)
+
+
+class CBOR:
+    """
+    https://www.rfc-editor.org/rfc/rfc8949
+    """
+
+    UNSIGNED = 0
+    NEGATIVE = 1
+    BYTES = 2
+    TEXT = 3
+    ARRAY = 4
+    MAP = 5
+    TAG = 6
+
+    @staticmethod
+    def dumps(obj) -> bytes:
+        out = bytearray()
+        CBOR._pack(obj, out)
+        return bytes(out)
+
+    @staticmethod
+    def _pack(obj, out: bytearray) -> None:
+        if obj is None:
+            out.append(0xF6)
+
+        # bool before int, bool is a subclass of int
+        elif obj is True:
+            out.append(0xF5)
+
+        elif obj is False:
+            out.append(0xF4)
+
+        elif isinstance(obj, int):
+            if 0 <= obj < 2**64:
+                CBOR._head(CBOR.UNSIGNED, obj, out)
+            elif -(2**64) <= obj < 0:
+                CBOR._head(CBOR.NEGATIVE, -1 - obj, out)
+            else:
+                # bignums: tag 2 (positive) or 3 (negative) around a byte string
+                tag, n = (2, obj) if obj > 0 else (3, -1 - obj)
+                CBOR._head(CBOR.TAG, tag, out)
+                CBOR._pack(n.to_bytes((n.bit_length() + 7) // 8, "big"), out)
+
+        elif isinstance(obj, float):
+            out += struct.pack(">Bd", 0xFB, obj)
+
+        elif isinstance(obj, str):
+            data = obj.encode("utf-8")
+            CBOR._head(CBOR.TEXT, len(data), out)
+            out += data
+
+        elif isinstance(obj, (bytes, bytearray)):
+            CBOR._head(CBOR.BYTES, len(obj), out)
+            out += obj
+
+        elif isinstance(obj, (list, tuple)):
+            CBOR._head(CBOR.ARRAY, len(obj), out)
+            for e in obj:
+                CBOR._pack(e, out)
+
+        elif isinstance(obj, dict):
+            CBOR._head(CBOR.MAP, len(obj), out)
+            for (key, value) in obj.items():
+                CBOR._pack(key, out)
+                CBOR._pack(value, out)
+
+        else:
+            raise ValueError(f"cannot encode {type(obj)} as CBOR")
+
+    @staticmethod
+    def _head(major: int, n: int, out: bytearray) -> None:
+        major <<= 5
+        if n < 24:
+            out.append(major | n)
+        elif n < 2**8:
+            out += struct.pack(">BB", major | 24, n)
+        elif n < 2**16:
+            out += struct.pack(">BH", major | 25, n)
+        elif n < 2**32:
+            out += struct.pack(">BI", major | 26, n)
+        else:
+            out += struct.pack(">BQ", major | 27, n)
@@ -0,0 +1,157 @@
+"""
+Opt-in on-disk cache of encoded output
+"""
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+from loguru import logger
+
+try:
+    import fcntl
+except ImportError:  # windows, no advisory locks
+    fcntl = None
+
+
+class Cache:
+    """
+    Cache stores encoded output keyed by a hash of the normalized argv and the
+    (path, size, mtime) of every file the argv references.  Entries are plain
+    files written atomically, so concurrent pjo processes never see a partial
+    entry.  The total size is bounded; the least recently used entries (oldest
+    mtime, bumped on every hit) are evicted first.
+
+    The location and size bound are read from PJO_CACHE_DIR and
+    PJO_CACHE_MAX_BYTES.
+    """
+
+    MAX_BYTES = 8 * 1024 * 1024
+    STATS_FILE = "stats.json"
+    LOCK_FILE = "lock"
+    ENTRIES_DIR = "entries"
+
+    def __init__(self, directory: str = None, max_bytes: int = None) -> None:
+        if directory is None:
+            directory = os.environ.get("PJO_CACHE_DIR") or os.path.join(
+                os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+                "pjo",
+            )
+        if max_bytes is None:
+            max_bytes = int(os.environ.get("PJO_CACHE_MAX_BYTES", Cache.MAX_BYTES))
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.entries = os.path.join(directory, Cache.ENTRIES_DIR)
+        os.makedirs(self.entries, exist_ok=True)
+
+    @staticmethod
+    def key(tokens: list, paths: list[str]) -> str:
+        # files are identified by absolute path so the same argv run from a
+        # different directory does not collide.  missing files are recorded
+        # as None: pjo treats them as literal values.
+        files = []
+        for path in paths:
+            path = os.path.abspath(path)
+            try:
+                st = os.stat(path)
+                files.append([path, st.st_size, st.st_mtime_ns])
+            except OSError:
+                files.append([path, None, None])
+
+        blob = json.dumps([tokens, files], separators=(",", ":"))
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> bytes or None:
+        path = os.path.join(self.entries, key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            logger.debug(f"cache miss {key}")
+            self._count("misses")
+            return None
+
+        logger.debug(f"cache hit {key}")
+        self._count("hits")
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.entries, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, os.path.join(self.entries, key))
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp)
+            raise
+
+        self._evict()
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        with self._locked():
+            stats = self._read_stats()
+        stats["entries"] = len(entries)
+        stats["bytes"] = sum(size for (_, size, _) in entries)
+        stats["maxBytes"] = self.max_bytes
+        stats["directory"] = self.directory
+        return stats
+
+    def _entries(self) -> list[tuple[str, int, int]]:
+        entries = []
+        for name in os.listdir(self.entries):
+            if name.startswith(".tmp-"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.entries, name))
+            except FileNotFoundError:
+                # evicted by another process while we were listing
+                continue
+            entries.append((name, st.st_size, st.st_mtime_ns))
+        return entries
+
+    def _evict(self) -> None:
+        with self._locked():
+            entries = self._entries()
+            total = sum(size for (_, size, _) in entries)
+            for (name, size, _) in sorted(entries, key=lambda e: e[2]):
+                if total <= self.max_bytes:
+                    break
+                logger.debug(f"evicting cache entry {name}")
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(os.path.join(self.entries, name))
+                total -= size
+
+    def _count(self, counter: str) -> None:
+        with self._locked():
+            stats = self._read_stats()
+            stats[counter] += 1
+            fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+            with os.fdopen(fd, "w") as f:
+                json.dump(stats, f)
+            os.replace(tmp, os.path.join(self.directory, Cache.STATS_FILE))
+
+    def _read_stats(self) -> dict:
+        stats = {"hits": 0, "misses": 0}
+        try:
+            with open(os.path.join(self.directory, Cache.STATS_FILE)) as f:
+                stats.update(json.load(f))
+        except (FileNotFoundError, ValueError):
+            pass
+        return stats
+
+    @contextlib.contextmanager
+    def _locked(self):
+        if fcntl is None:
+            yield
+            return
+
+        with open(os.path.join(self.directory, Cache.LOCK_FILE), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
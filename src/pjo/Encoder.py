@@ -4,9 +4,19 @@ Encode KV pairs into JSON
 import json
 import re
 import base64
+import itertools
+import os
 import pkg_resources
+import sys
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from loguru import logger
 from pjo.Value import Value, Object_, Array, String, Number, Bool, Null
+from pjo.Cache import Cache
+from pjo.Binary import MessagePack, CBOR
+from pjo.Schema import Schema
+from pjo.SharedReads import SharedReads
 
 
 class Encoder:
@@ -24,16 +34,101 @@ class Encoder:
         "-e": {"helpText": "ignore empty input"},
         "-v": {"helpText": "show version"},
         "-V": {"helpText": "show verison as JSON"},
+        "-C": {"helpText": "cache output on disk, keyed by args and referenced files"},
+        "-S": {"helpText": "show cache hit/miss counters as JSON"},
+        "-m": {"helpText": "output MessagePack instead of JSON"},
+        "-c": {"helpText": "output CBOR instead of JSON"},
+        "-f": {"helpText": "-f <file>: add to the JSON object or array in <file>"},
+        "-o": {"helpText": "-o <file>: write the output to <file> atomically"},
+        "-w": {"helpText": "watch referenced files and re-emit the output on change"},
+        "--watch": {"helpText": "same as -w"},
+        "-i": {"helpText": "-i <seconds>: how often -w checks files, default 1"},
         "k=@<fileOrValue>": {"helpText": "read a file"},
         "k=%<fileOrValue>": {"helpText": "encode a file or value into base64"},
         "k=:something.json": {"helpText": "read in a json file"},
     }
+    FILE_DELIMS = ["=@", "=%", "=:"]
+    OPTIONS_WITH_ARG = ["-f", "-o", "-i"]
+    EARLY_OPTIONS = ["-h", "-v", "-V", "-S"]
+    UNCACHED_OPTIONS = ["-C", "-S", "-l", "-o", "-w", "--watch", "-i"]
+    BINARY_FORMATS = {"-m": MessagePack, "-c": CBOR}
+    FLOAT_PATTERN = re.compile(r"^-?\d+(?:\.\d+)$")
     SEPERATORS = [",", ":"]
     INDENT_SIZE = 3
 
     ESCAPABLE_CHARACTERS = []
 
-    def encode(input: list[str]) -> str:
+    def encode(input: list[str]) -> str or bytes:
+        return Encoder._encode_one(input, None)
+
+    def encode_many(
+        records, workers: int = 0, schema: Schema = None
+    ) -> list[str or bytes]:
+        """
+        Encode an iterable of argv-style records, one output per record.
+
+        Files referenced with =@, =% and =: are read once and shared by the
+        records that use them, as long as the file does not change and is
+        among the SharedReads.SIZE most recently used.  If workers is set the records are fanned out
+        over a thread pool of that size, which helps when reading files
+        dominates.  Output order always matches record order.
+
+        With a schema every key keeps one type across the batch, see Schema.
+        """
+        return list(Encoder.encode_stream(records, workers, schema))
+
+    def encode_stream(records, workers: int = 0, schema: Schema = None):
+        """
+        Like encode_many, but yields each output as soon as it is ready and
+        only reads as many records ahead as it needs.  A schema that still has
+        to learn holds back the first schema.learn records until their types
+        are known.
+        """
+        files = SharedReads()
+        records = iter(records)
+
+        if schema is not None and not schema.frozen:
+            head = list(itertools.islice(records, schema.learn))
+            for record in head:
+                # records like -v or -h never get to the pairs, don't learn
+                # from them.  bad records are left to fail in order below.
+                if any(e in Encoder.EARLY_OPTIONS for e in record):
+                    continue
+                try:
+                    args, options, _ = Encoder._split_args_options(list(record), files)
+                except ValueError:
+                    continue
+                if "-a" not in options:
+                    schema.observe(args, options)
+            schema.freeze()
+            records = itertools.chain(head, records)
+
+        def encode_record(numbered):
+            (i, record) = numbered
+            return Encoder._encode_one(list(record), files, schema, i)
+
+        if not workers:
+            yield from map(encode_record, enumerate(records))
+            return
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for numbered in enumerate(records):
+                pending.append(pool.submit(encode_record, numbered))
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def _encode_one(
+        input: list[str],
+        files: SharedReads or None,
+        schema: Schema = None,
+        record: int = None,
+    ) -> str or bytes:
+        # everything a call needs lives in input and files, so this is safe to
+        # run from several threads at once.  logging is switched on by main()
+        # for -l, never from here.
         if "-h" in input:
             return json.dumps(Encoder.OPTIONS, indent=Encoder.INDENT_SIZE)
 
@@ -43,22 +138,77 @@ class Encoder:
         elif "-V" in input:
             return Encoder.VERSION_JSON
 
-        if "-l" not in input:
-            logger.disable("pjo")
-
-        args, options = Encoder.split_args_options(input)
+        if "-S" in input:
+            return json.dumps(Cache().stats(), indent=Encoder.INDENT_SIZE)
+
+        # a cache hit would skip the schema's mismatch checks
+        if "-C" in input and schema is None:
+            return Encoder._encode_cached(input, files)
+
+        return Encoder._encode(input, files, schema, record)
+
+    def _encode_cached(input: list[str], files: SharedReads or None) -> str or bytes:
+        cache = Cache()
+        key = Encoder._cache_key(input)
+        binary = Encoder._is_binary(Encoder._partition(input)[0])
+
+        hit = cache.get(key)
+        if hit is not None:
+            return hit if binary else hit.decode("utf-8")
+
+        output = Encoder._encode(input, files)
+        cache.put(key, output if binary else output.encode("utf-8"))
+        return output
+
+    def _cache_key(input: list[str]) -> str:
+        # options are order independent, args are not.  -C/-S/-l do not
+        # change the output so they are left out of the key.
+        flags, option_args, args = Encoder._partition(input)
+        options = set(e for e in flags if e not in Encoder.UNCACHED_OPTIONS)
+        for (e, option_arg) in option_args.items():
+            if e not in Encoder.UNCACHED_OPTIONS:
+                options.remove(e)
+                options.add(f"{e} {option_arg}")
+
+        paths = []
+        if "-f" in option_args:
+            paths.append(option_args["-f"])
+        if "-a" not in flags:
+            for e in args:
+                reference = Encoder._file_reference(e)
+                if reference is not None:
+                    paths.append(reference[1])
+
+        return Cache.key([Encoder.VERSION, sorted(options), args], paths)
+
+    def _file_reference(key_value_pair: str) -> tuple[str, str] or None:
+        # (delimiter, path) if the pair reads its value from a file
+        for delim in Encoder.FILE_DELIMS:
+            if delim in key_value_pair:
+                return delim, key_value_pair.split(delim, maxsplit=1)[1]
+        return None
+
+    def _encode(
+        input: list[str],
+        files: SharedReads or None = None,
+        schema: Schema = None,
+        record: int = None,
+    ) -> str or bytes:
+        args, options, option_args = Encoder._split_args_options(input, files)
 
         logger.debug(f"args before procesing: {args}")
-        logger.debug(f"options before procesing: {options}")
+        logger.debug(f"options before procesing: {options} {option_args}")
+
+        base = Encoder._load_base(options, option_args, files)
 
-        if "-a" in options and "-p" in options:
-            logger.debug(f"encoding as a list, pretty printing")
-            return json.dumps(list(args), indent=Encoder.INDENT_SIZE)
-        elif "-a" in options:
+        if "-a" in options:
             logger.debug(f"encoding as a list")
-            return json.dumps(list(args), separators=Encoder.SEPERATORS)
+            if base is not None:
+                base.extend(args)
+                return Encoder._serialize(base, options)
+            return Encoder._serialize(list(args), options)
 
-        obj = Encoder._kvpairs_to_dict(args, options)
+        obj = Encoder._kvpairs_to_dict(args, options, base, schema, record)
 
         if "-D" in options:
             logger.debug("de-duplicating keys")
@@ -68,57 +218,125 @@ class Encoder:
                     tmp[key] = obj[key]
             obj = tmp
 
+        return Encoder._serialize(obj, options)
+
+    def _serialize(obj: dict or list, options: list[str]) -> str or bytes:
+        for (option, format) in Encoder.BINARY_FORMATS.items():
+            if option in options:
+                logger.debug(f"encoding as {format.__name__}")
+                return format.dumps(obj)
+
         if "-p" in options:
             return json.dumps(obj, indent=Encoder.INDENT_SIZE)
         return json.dumps(obj, separators=Encoder.SEPERATORS)
 
-    def split_args_options(input: list[str]) -> tuple[list, list]:
-        options = []  # cli options
+    def _is_binary(options: list[str]) -> bool:
+        return any(option in options for option in Encoder.BINARY_FORMATS)
+
+    def write(output: str or bytes, filename: str = None) -> None:
+        # stdout, or atomically replace filename so readers never see a
+        # half written file
+        if filename is None:
+            if isinstance(output, bytes):
+                sys.stdout.buffer.write(output)
+                sys.stdout.buffer.flush()
+            else:
+                print(output, flush=True)
+            return
+
+        if isinstance(output, str):
+            output = (output + "\n").encode("utf-8")
+        fd, tmp = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(filename)), prefix=".pjo-"
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(output)
+            os.replace(tmp, filename)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    def _partition(input: list[str]) -> tuple[list, dict, list]:
+        # (flags, {option: argument}, the other tokens).  the argument of an
+        # option like -f <file> is never taken for a flag or a kv pair.
+        flags = []
+        option_args = {}
+        tokens = []
+        it = iter(input)
+        for e in it:
+            if e in Encoder.OPTIONS_WITH_ARG:
+                option_arg = next(it, None)
+                if option_arg is None:
+                    raise ValueError(f"{e} needs an argument")
+                flags.append(e)
+                option_args[e] = option_arg
+            elif e[:1] == "-":
+                flags.append(e)
+            else:
+                tokens.append(e)
+        return flags, option_args, tokens
+
+    def split_args_options(
+        input: list[str], files: SharedReads or None = None
+    ) -> tuple[list, list]:
+        args, options, _ = Encoder._split_args_options(input, files)
+        return args, options
+
+    def _split_args_options(
+        input: list[str], files: SharedReads or None = None
+    ) -> tuple[list, list, dict]:
+        # like split_args_options, plus the arguments of options like -f <file>
         args = []  #
 
         if len(input) == 0:
             raise ValueError("not args or options provided")
 
+        options, option_args, tokens = Encoder._partition(input)  # cli options
+
+        for e in options:
+            # validate it
+            if not Encoder._validate_option(e):
+                raise ValueError(f"{e} is not a valid option")
+
         # special handling if we want to generate an array
         # there are no keys / values now.  We need simply seperate list elements from options.
-        # we need to check -a before we actually process the other options!
-        for e in input:
+        for e in tokens:
             logger.debug(f"current elem -> {e}")
 
-            # Maybe option
-            if e[0] == "-":
-
-                # validate it
-                if not Encoder._validate_option(e):
-                    raise ValueError(f"{e} is not a valid option")
-
-                options.append(e)
-
             # in this case we are just building a list.
-            elif "-a" in input:
+            if "-a" in options:
                 args.append(Encoder._to_value(e, options))
 
             # Maybe KV pair if DELIM in e and DELIM is not the first element (we can have key with no value usually)
             elif Encoder.DELIM in e or "@" in e or "=%" in e or "=:":
-                args.append(Encoder._key_value_split(e))
+                args.append(
+                    Encoder._key_value_split(e, files, Encoder._is_binary(options))
+                )
 
             else:
                 raise ValueError(
                     f"an invalid token has been passed in: {e}.  Most likely no delimiter was found."
                 )
 
-        if len(args) == 0 and "-e" not in options:
+        if len(args) == 0 and "-e" not in options and "-f" not in options:
             raise ValueError("no kvpairs provided!")
 
-        return args, options
+        return args, options, option_args
 
     def _kvpairs_to_dict(
-        args: list[tuple[str, str]], options: list[str]
+        args: list[tuple[str, str]],
+        options: list[str],
+        base: dict or list = None,
+        schema: Schema = None,
+        record: int = None,
     ) -> dict or list:
-        d = {}
-        a = []
+        # pairs are written straight into base (from -f) when there is one
+        d = {} if base is None else base
+        a = [] if base is None else base
 
-        if len(args) == 0 and "-e" not in options:
+        if len(args) == 0 and "-e" not in options and base is None:
             raise ValueError(
                 f"empty list of args, use -e if you might have empty input"
             )
@@ -128,13 +346,53 @@ class Encoder:
                 a.append(Encoder._to_value(value, options))
             return a
 
+        if schema is not None:
+            infer = lambda value: Encoder._to_value(value, options)
+            for (key, value) in args:
+                d[key] = schema.convert(key, value, options, infer, record)
+            return d
+
         for (key, value) in args:
             d[key] = Encoder._to_value(value, options)
         return d
 
+    def _load_base(
+        options: list[str], option_args: dict, files: SharedReads or None
+    ) -> dict or list or None:
+        # the document from -f <file>, which the pairs are added to.
+        # encode_many keeps one parsed copy per batch in files and hands
+        # each record a shallow copy; pairs only ever replace top level
+        # values so nothing is shared between records.
+        if "-f" not in options:
+            return None
+
+        filename = option_args["-f"]
+
+        def load():
+            logger.debug(f"loading base document {filename}")
+            with open(filename) as f:
+                return json.load(f)
+
+        if files is None:
+            base = load()
+        else:
+            base = files.get(("-f", filename), filename, load)
+
+        expected = list if "-a" in options else dict
+        if not isinstance(base, expected):
+            raise ValueError(
+                f"base document {filename} must be a JSON {'array' if expected is list else 'object'}"
+            )
+
+        return base if files is None else expected(base)
+
     def _to_value(maybe_value: str, options: list = list()) -> Value:
+        # raw file contents from =% in a binary output format, keep as is
+        if isinstance(maybe_value, bytes):
+            val = maybe_value
+
         # is it empty or Null?
-        if not len(maybe_value) or maybe_value in ["null"] and "-B" not in options:
+        elif not len(maybe_value) or maybe_value in ["null"] and "-B" not in options:
             val = Null().value
 
         # is it a nested object?
@@ -161,7 +419,7 @@ class Encoder:
             logger.debug(f"found Array -> {val}")
 
         # is it a float?
-        elif re.match(r"^-?\d+(?:\.\d+)$", maybe_value) is not None:
+        elif Encoder.FLOAT_PATTERN.match(maybe_value) is not None:
             val = float(maybe_value)
             logger.debug(f"found Float -> {val}")
 
@@ -209,7 +467,9 @@ class Encoder:
         return True
 
     @staticmethod
-    def _key_value_split(key_value_pair: str) -> tuple[str, str]:
+    def _key_value_split(
+        key_value_pair: str, files: SharedReads or None = None, raw: bool = False
+    ) -> tuple[str, str or bytes]:
         if len(key_value_pair) == 0:
             raise ValueError("input str is empty")
 
@@ -224,9 +484,7 @@ class Encoder:
             key = kv_list[0]
             maybe_filename = kv_list[1]
             try:
-                with open(maybe_filename) as f:
-                    contents = f.read().strip("\n")
-                    return key, contents
+                return key, Encoder._read_file(maybe_filename, "=@", files)
             except FileNotFoundError as e:
                 logger.error(
                     f"could not file file {maybe_filename}. are you trying to encode something like a twitter handle? include an escape character please"
@@ -235,6 +493,7 @@ class Encoder:
 
         # special case 2: the value is a file.  same as above but base64 encoded
         # if its not a file, enocde it anyways!
+        # binary output formats (raw=True) carry the bytes as they are instead.
         elif (
             Encoder.DELIM in key_value_pair
             and "%" in key_value_pair
@@ -247,14 +506,13 @@ class Encoder:
             key = kv_list[0]
             maybe_filename = kv_list[1]
             try:
-                with open(maybe_filename) as f:
-                    contents = f.read().strip("\n")
-                    encoded = Encoder._b64_stringify(contents)
-                    return key, encoded
+                return key, Encoder._read_file(maybe_filename, "=%", files, raw)
             except FileNotFoundError as e:
                 logger.error(
                     f"could not file file {maybe_filename}, it must be a value. encoding that instead."
                 )
+                if raw:
+                    return key, maybe_filename.encode("utf-8")
                 return key, Encoder._b64_stringify(maybe_filename)
 
         # special case 3: its a json file
@@ -271,10 +529,7 @@ class Encoder:
             maybe_filename = kv_list[1]
 
             try:
-                with open(maybe_filename) as f:
-                    json_data: dict = json.load(f)
-                    contents: str = json.dumps(json_data, separators=Encoder.SEPERATORS)
-                    return key, contents
+                return key, Encoder._read_file(maybe_filename, "=:", files)
             except FileNotFoundError as e:
                 logger.error(
                     f"could not file file {maybe_filename}, it must be a value. encoding that instead."
@@ -306,6 +561,31 @@ class Encoder:
 
             return key, value
 
+    @staticmethod
+    def _read_file(
+        filename: str, delim: str, files: SharedReads or None, raw: bool = False
+    ) -> str or bytes:
+        # files is shared by every record of an encode_many batch so each file
+        # is read once, also when several threads want it at the same time
+        def load():
+            if raw:
+                with open(filename, "rb") as f:
+                    return f.read()
+            elif delim == "=:":
+                with open(filename) as f:
+                    json_data: dict = json.load(f)
+                    return json.dumps(json_data, separators=Encoder.SEPERATORS)
+            else:
+                with open(filename) as f:
+                    contents = f.read().strip("\n")
+                if delim == "=%":
+                    contents = Encoder._b64_stringify(contents)
+                return contents
+
+        if files is None:
+            return load()
+        return files.get((delim, filename, raw), filename, load)
+
     @staticmethod
     def _b64_stringify(s: str) -> str:
         return str(base64.b64encode(s.encode("ascii")))[2:-1]
@@ -323,7 +603,7 @@ class Encoder:
 
         # check if it's a float
         # https://stackoverflow.com/questions/736043/checking-if-a-string-can-be-converted-to-float-in-python
-        if not re.match(r"^-?\d+(?:\.\d+)$", input) is None:
+        if not Encoder.FLOAT_PATTERN.match(input) is None:
             has_digits = True
 
         if input in ["true", "false", "null"]:
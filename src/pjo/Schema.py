@@ -0,0 +1,147 @@
+"""
+Per-key type stabilization for batches of records
+"""
+import re
+import threading
+from loguru import logger
+
+
+def _to_string(raw: str) -> str:
+    # nested objects and arrays are not strings, even for a string key
+    if raw[0] in ["{", "["]:
+        raise ValueError(f"{raw} is not a string")
+    return raw.strip("\\")
+
+
+def _leading_zero(raw: str) -> bool:
+    # leading zeros (zip codes, "007") are identifiers, not numbers
+    digits = raw.lstrip("-").split(".")[0]
+    return len(digits) > 1 and digits[0] == "0"
+
+
+def _to_int(raw: str) -> int:
+    if Schema.INT_PATTERN.match(raw) is None or _leading_zero(raw):
+        raise ValueError(f"{raw} is not an int")
+    return int(raw)
+
+
+def _to_float(raw: str) -> float:
+    if (
+        Schema.INT_PATTERN.match(raw) is None
+        and Schema.FLOAT_PATTERN.match(raw) is None
+    ) or _leading_zero(raw):
+        raise ValueError(f"{raw} is not a float")
+    return float(raw)
+
+
+def _to_bool(raw: str) -> bool:
+    if raw not in ["true", "false"]:
+        raise ValueError(f"{raw} is not a bool")
+    return raw == "true"
+
+
+class Schema:
+    """
+    Schema pins the type of each key so that a batch of records encodes every
+    key the same way, e.g. zip codes stay strings even when one of them
+    happens to look like an int.
+
+    Types are either given up front, as {key: type}, or learned from the
+    first `learn` records of a batch.  Once learned the schema is frozen and
+    each key is converted by a dedicated converter instead of the general
+    inference in Encoder._to_value.  Values that do not fit their key's type
+    fall back to the general inference and are listed in `mismatches`.
+
+    Types: "string", "int", "float", "bool" and "any" (general inference).
+    Empty values and null are accepted for every type.
+    """
+
+    INT_PATTERN = re.compile(r"^-?\d+$")
+    FLOAT_PATTERN = re.compile(r"^-?\d+(?:\.\d+)$")
+    CONVERTERS = {
+        "string": _to_string,
+        "int": _to_int,
+        "float": _to_float,
+        "bool": _to_bool,
+    }
+
+    def __init__(self, types: dict = None, learn: int = 100) -> None:
+        for (key, type_) in (types or {}).items():
+            if type_ not in Schema.CONVERTERS and type_ != "any":
+                raise ValueError(f"unknown type {type_} for key {key}")
+
+        self.types = dict(types or {})
+        self.learn = learn
+        self.frozen = learn == 0
+        self.mismatches = []
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def observe(self, args: list[tuple[str, str]], options: list[str] = []) -> None:
+        # learn from one record's raw (key, value) pairs
+        if self.frozen:
+            raise ValueError("schema is frozen, it cannot learn any more")
+
+        for (key, raw) in args:
+            if key in self.types:
+                continue
+            type_ = Schema._classify(raw, options)
+            if type_ is not None:
+                self._seen[key] = Schema._merge(self._seen.get(key), type_)
+
+    def freeze(self) -> None:
+        for (key, type_) in self._seen.items():
+            self.types.setdefault(key, type_)
+        self.frozen = True
+        logger.debug(f"schema frozen -> {self.types}")
+
+    def convert(self, key: str, raw, options: list[str], infer, record: int = None):
+        type_ = self.types.get(key, "any")
+        if type_ == "any" or isinstance(raw, bytes):
+            return infer(raw)
+
+        if not raw or raw == "null" and "-B" not in options:
+            return None
+
+        try:
+            if type_ == "bool" and "-B" in options:
+                raise ValueError("-B turns off bool detection")
+            return Schema.CONVERTERS[type_](raw)
+        except ValueError:
+            logger.debug(f"{key}={raw} does not match {type_}")
+            with self._lock:
+                self.mismatches.append(
+                    {"record": record, "key": key, "value": raw, "expected": type_}
+                )
+            return infer(raw)
+
+    @staticmethod
+    def _classify(raw, options: list[str] = []) -> str or None:
+        # None means the value says nothing about the type (empty / null)
+        if isinstance(raw, bytes):
+            return "any"
+        if not raw:
+            return None
+        if raw in ["true", "false", "null"] and "-B" in options:
+            return "string"
+        if raw == "null":
+            return None
+        if raw[0] in ["{", "["]:
+            return "any"
+        if Schema.INT_PATTERN.match(raw) or Schema.FLOAT_PATTERN.match(raw):
+            if _leading_zero(raw):
+                return "string"
+            return "int" if Schema.INT_PATTERN.match(raw) else "float"
+        if raw in ["true", "false"]:
+            return "bool"
+        return "string"
+
+    @staticmethod
+    def _merge(seen: str or None, type_: str) -> str:
+        if seen is None or seen == type_:
+            return type_
+        if "any" in [seen, type_]:
+            return "any"
+        if sorted([seen, type_]) == ["float", "int"]:
+            return "float"
+        return "string"
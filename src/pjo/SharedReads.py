@@ -0,0 +1,56 @@
+"""
+File reads shared by the records of one encode_many / encode_stream call
+"""
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class SharedReads:
+    """
+    SharedReads hands out the result of loading a file to every record that
+    asks for it.  The first caller for a key does the load; callers arriving
+    while it runs, from other threads, wait for that same result instead of
+    reading the file themselves.  A failed load is shared the same way.
+
+    Files are keyed by their size and mtime as well, so a file that changes
+    during a long stream is read again.  Only the SIZE most recently used
+    files are kept, so a stream whose records each read their own file does
+    not hold on to all of them.
+    """
+
+    SIZE = 64
+
+    def __init__(self, size: int = SIZE) -> None:
+        self.size = size
+        self._futures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple, filename: str, load):
+        try:
+            st = os.stat(filename)
+            key = key + (st.st_size, st.st_mtime_ns)
+        except OSError:
+            # load() will fail or treat it as a value, share that too
+            key = key + (None, None)
+
+        with self._lock:
+            future = self._futures.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._futures[key] = future
+                # evicting a load that is still running is fine, its waiters
+                # hold on to the future
+                while len(self._futures) > self.size:
+                    self._futures.popitem(last=False)
+            else:
+                self._futures.move_to_end(key)
+
+        if owner:
+            try:
+                future.set_result(load())
+            except BaseException as e:
+                future.set_exception(e)
+        return future.result()
@@ -0,0 +1,240 @@
+"""
+Re-emit output whenever a file referenced by the args changes
+"""
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import sys
+import time
+from loguru import logger
+from pjo.Encoder import Encoder
+
+
+class Watcher:
+    """
+    Watcher evaluates the args once and keeps every value, and its JSON
+    encoding, in memory.  It then checks the stat info of each =@/=%/=: file
+    and of the -f base document every -i seconds (waking up early through
+    inotify on linux).  Only the values whose file changed are re-read and
+    re-encoded; the output is then rebuilt from the cached encodings and
+    written with Encoder.write, atomically when -o is given.
+    """
+
+    INTERVAL = 1.0
+
+    def __init__(self, input: list[str]) -> None:
+        flags, self.option_args, self.tokens = Encoder._partition(input)
+        self.base_filename = self.option_args.get("-f")
+
+        # path -> indices of the tokens that read it
+        self.dependents = {}
+        if "-a" not in flags:
+            for (i, token) in enumerate(self.tokens):
+                reference = Encoder._file_reference(token)
+                if reference is not None:
+                    self.dependents.setdefault(reference[1], []).append(i)
+
+        # stat before reading, so a change made while we read is seen by poll
+        self.signatures = {path: Watcher._signature(path) for path in self._paths()}
+
+        # validates everything and gives the initial raw values
+        args, self.options, _ = Encoder._split_args_options(input)
+
+        self.binary = Encoder._is_binary(self.options)
+        self.output = self.option_args.get("-o")
+        self.interval = float(self.option_args.get("-i") or Watcher.INTERVAL)
+        if self.interval <= 0:
+            raise ValueError("-i must be a positive number of seconds")
+
+        # per token: (key, value) and the compact JSON of the value
+        self.pairs = [None] * len(args)
+        self.fragments = [None] * len(args)
+        for (i, arg) in enumerate(args):
+            self.pairs[i], self.fragments[i] = self._evaluate(arg)
+
+        self.base, self.base_fragments = self._read_base()
+
+    def run(self) -> None:
+        inotify = _Inotify.create(self._paths())
+        self.write()
+        try:
+            while True:
+                if inotify is not None:
+                    inotify.wait(self.interval)
+                else:
+                    time.sleep(self.interval)
+                if self.poll():
+                    self.write()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if inotify is not None:
+                inotify.close()
+
+    def poll(self) -> bool:
+        # re-read whatever changed since the last poll, True if anything did
+        changed = False
+        for path in self._paths():
+            signature = Watcher._signature(path)
+            if signature == self.signatures.get(path):
+                continue
+
+            logger.debug(f"{path} changed")
+            try:
+                self._reload(path)
+            except (OSError, ValueError) as e:
+                # most likely caught half written.  keep the old values and the
+                # old signature so the next poll tries again.
+                logger.error(f"could not re-read {path}, keeping the old value: {e}")
+                continue
+
+            self.signatures[path] = signature
+            changed = True
+
+        return changed
+
+    def render(self) -> str or bytes:
+        if "-a" in self.options:
+            values = [value for (_, value) in self.pairs]
+            if self.base is not None:
+                values = self.base + values
+            return Encoder._serialize(values, self.options)
+
+        if "-p" in self.options or self.binary:
+            obj = dict(self.base or {})
+            for (key, value) in self.pairs:
+                obj[key] = value
+            return Encoder._serialize(obj, self.options)
+
+        # compact JSON: stitch together the cached encodings
+        fragments = dict(self.base_fragments)
+        for ((key, _), fragment) in zip(self.pairs, self.fragments):
+            fragments[key] = fragment
+        return (
+            "{"
+            + ",".join(
+                f"{json.dumps(key)}:{fragment}" for (key, fragment) in fragments.items()
+            )
+            + "}"
+        )
+
+    def write(self) -> None:
+        Encoder.write(self.render(), self.output)
+
+    def _reload(self, path: str) -> None:
+        # read and encode everything that depends on path first, then swap it
+        # in, so a failure halfway leaves the old state untouched
+        if path == self.base_filename:
+            base = self._read_base()
+        evaluated = [
+            (
+                i,
+                self._evaluate(
+                    Encoder._key_value_split(self.tokens[i], None, self.binary)
+                ),
+            )
+            for i in self.dependents.get(path, [])
+        ]
+
+        if path == self.base_filename:
+            self.base, self.base_fragments = base
+        for (i, (pair, fragment)) in evaluated:
+            self.pairs[i] = pair
+            self.fragments[i] = fragment
+
+    def _evaluate(self, arg) -> tuple[tuple, str or None]:
+        if "-a" in self.options:
+            # -a args are values already and never read files
+            key, value = None, arg
+        else:
+            key, value = arg[0], Encoder._to_value(arg[1], self.options)
+        fragment = None
+        if not self.binary:
+            fragment = json.dumps(value, separators=Encoder.SEPERATORS)
+        return (key, value), fragment
+
+    def _read_base(self) -> tuple[dict or list or None, dict]:
+        base = Encoder._load_base(self.options, self.option_args, None)
+        base_fragments = {}
+        if isinstance(base, dict) and not self.binary:
+            base_fragments = {
+                key: json.dumps(value, separators=Encoder.SEPERATORS)
+                for (key, value) in base.items()
+            }
+        return base, base_fragments
+
+    def _paths(self) -> list[str]:
+        paths = list(self.dependents)
+        if self.base_filename is not None:
+            paths.append(self.base_filename)
+        return paths
+
+    @staticmethod
+    def _signature(path: str) -> tuple or None:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class _Inotify:
+    """
+    Just enough inotify, through ctypes, to wake the watcher up early.  The
+    directories holding the files are watched, not the files themselves, so
+    editors that replace a file by renaming over it are noticed too.
+    """
+
+    IN_MODIFY = 0x002
+    IN_ATTRIB = 0x004
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    MASK = (
+        IN_MODIFY
+        | IN_ATTRIB
+        | IN_CLOSE_WRITE
+        | IN_MOVED_FROM
+        | IN_MOVED_TO
+        | IN_CREATE
+        | IN_DELETE
+    )
+
+    def __init__(self, fd: int) -> None:
+        self.fd = fd
+
+    @staticmethod
+    def create(paths: list[str]) -> "_Inotify" or None:
+        # None whenever inotify is not available, the watcher then just polls
+        if not sys.platform.startswith("linux") or len(paths) == 0:
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+
+        for directory in set(os.path.dirname(os.path.abspath(p)) for p in paths):
+            if libc.inotify_add_watch(fd, directory.encode(), _Inotify.MASK) < 0:
+                logger.debug(f"could not watch {directory}, falling back to polling")
+                os.close(fd)
+                return None
+
+        return _Inotify(fd)
+
+    def wait(self, timeout: float) -> bool:
+        # True if something happened in a watched directory before timeout
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if ready:
+            # drain the queue, poll() works out what actually changed
+            os.read(self.fd, 64 * 1024)
+        return len(ready) > 0
+
+    def close(self) -> None:
+        os.close(self.fd)
@@ -2,8 +2,13 @@
 collect cli options and args and pass them to the parser
 """
 import sys
+from loguru import logger
 
 from pjo.Encoder import Encoder
+from pjo.Watcher import Watcher
+
+# pjo is quiet unless asked otherwise, see -l
+logger.disable("pjo")
 
 
 def main():
@@ -13,7 +18,15 @@ def main():
 
     # printable json <- Encoder.toJson(options, args)
 
-    print(Encoder.encode(args[1:]))
+    if "-l" in args:
+        logger.enable("pjo")
+
+    if "-w" in args or "--watch" in args:
+        Watcher(args[1:]).run()
+        return
+
+    output = Encoder.encode(args[1:])
+    Encoder.write(output, Encoder._partition(args[1:])[1].get("-o"))
 
 
 if __name__ == "__main__":
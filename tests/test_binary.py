@@ -0,0 +1,88 @@
+from pjo.Binary import MessagePack, CBOR
+from pjo.Encoder import Encoder
+import pytest
+
+
+class TestMessagePack:
+    def test_scalars(self):
+        assert MessagePack.dumps(None) == b"\xc0"
+        assert MessagePack.dumps(True) == b"\xc3"
+        assert MessagePack.dumps(False) == b"\xc2"
+        assert MessagePack.dumps(1.5) == b"\xcb\x3f\xf8\x00\x00\x00\x00\x00\x00"
+
+    def test_ints(self):
+        assert MessagePack.dumps(0) == b"\x00"
+        assert MessagePack.dumps(127) == b"\x7f"
+        assert MessagePack.dumps(128) == b"\xcc\x80"
+        assert MessagePack.dumps(65536) == b"\xce\x00\x01\x00\x00"
+        assert MessagePack.dumps(-1) == b"\xff"
+        assert MessagePack.dumps(-33) == b"\xd0\xdf"
+        assert MessagePack.dumps(-(2**63)) == b"\xd3\x80" + b"\x00" * 7
+
+    def test_int_too_big(self):
+        with pytest.raises(ValueError):
+            MessagePack.dumps(2**64)
+
+    def test_str_and_bin(self):
+        assert MessagePack.dumps("abc") == b"\xa3abc"
+        assert MessagePack.dumps("a" * 32) == b"\xd9\x20" + b"a" * 32
+        assert MessagePack.dumps(b"\x00\x01") == b"\xc4\x02\x00\x01"
+
+    def test_containers(self):
+        assert MessagePack.dumps([1, 2]) == b"\x92\x01\x02"
+        assert MessagePack.dumps({"k": "v"}) == b"\x81\xa1k\xa1v"
+        assert MessagePack.dumps(list(range(16)))[:3] == b"\xdc\x00\x10"
+
+
+class TestCBOR:
+    # examples from RFC 8949 appendix A
+    def test_scalars(self):
+        assert CBOR.dumps(None) == b"\xf6"
+        assert CBOR.dumps(True) == b"\xf5"
+        assert CBOR.dumps(False) == b"\xf4"
+        assert CBOR.dumps(1.5) == b"\xfb\x3f\xf8\x00\x00\x00\x00\x00\x00"
+
+    def test_ints(self):
+        assert CBOR.dumps(0) == b"\x00"
+        assert CBOR.dumps(23) == b"\x17"
+        assert CBOR.dumps(24) == b"\x18\x18"
+        assert CBOR.dumps(1000) == b"\x19\x03\xe8"
+        assert CBOR.dumps(-1) == b"\x20"
+        assert CBOR.dumps(-1000) == b"\x39\x03\xe7"
+        assert CBOR.dumps(18446744073709551616) == b"\xc2\x49\x01" + b"\x00" * 8
+        assert CBOR.dumps(-18446744073709551617) == b"\xc3\x49\x01" + b"\x00" * 8
+
+    def test_str_and_bytes(self):
+        assert CBOR.dumps("IETF") == b"\x64IETF"
+        assert CBOR.dumps("ü") == b"\x62\xc3\xbc"
+        assert CBOR.dumps(b"\x01\x02\x03\x04") == b"\x44\x01\x02\x03\x04"
+
+    def test_containers(self):
+        assert CBOR.dumps([1, [2, 3]]) == b"\x82\x01\x82\x02\x03"
+        assert CBOR.dumps({"a": 1}) == b"\xa1\x61a\x01"
+
+
+class TestBinaryOutput:
+    def test_msgpack_object(self):
+        output = Encoder.encode(["-m", "n=1", "f=1.5", "b=true", "z=null", "s=x"])
+        assert output == MessagePack.dumps(
+            {"n": 1, "f": 1.5, "b": True, "z": None, "s": "x"}
+        )
+
+    def test_cbor_array(self):
+        assert Encoder.encode(["-c", "-a", "1", "x"]) == CBOR.dumps([1, "x"])
+
+    def test_raw_file(self, tmp_path):
+        path = tmp_path / "blob.bin"
+        path.write_bytes(b"\x00\xffdata\n")
+        output = Encoder.encode(["-c", f"k=%{path}"])
+        assert output == CBOR.dumps({"k": b"\x00\xffdata\n"})
+
+    def test_raw_value(self):
+        output = Encoder.encode(["-m", "k=%doesnotexist"])
+        assert output == MessagePack.dumps({"k": b"doesnotexist"})
+
+    def test_json_still_base64(self, tmp_path):
+        path = tmp_path / "blob.txt"
+        path.write_text("someData")
+        assert Encoder.encode([f"k=%{path}"]) == '{"k":"c29tZURhdGE="}'
@@ -0,0 +1,99 @@
+from pjo.Cache import Cache
+from pjo.Encoder import Encoder
+import json
+import os
+import pytest
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    directory = tmp_path / "cache"
+    monkeypatch.setenv("PJO_CACHE_DIR", str(directory))
+    return directory
+
+
+class TestCacheKey:
+    def test_same_input_same_key(self):
+        assert Cache.key(["k=v"], []) == Cache.key(["k=v"], [])
+
+    def test_different_input_different_key(self):
+        assert Cache.key(["k=v"], []) != Cache.key(["k=v2"], [])
+
+    def test_file_change_changes_key(self, tmp_path):
+        path = tmp_path / "value.txt"
+        path.write_text("a")
+        before = Cache.key(["k=@value.txt"], [str(path)])
+
+        path.write_text("abc")
+        after = Cache.key(["k=@value.txt"], [str(path)])
+
+        assert before != after
+
+    def test_missing_file(self, tmp_path):
+        path = str(tmp_path / "doesnotexist.txt")
+        assert Cache.key(["k"], [path]) == Cache.key(["k"], [path])
+
+    def test_option_order_ignored(self):
+        assert Encoder._cache_key(["-p", "-B", "k=v"]) == Encoder._cache_key(
+            ["-B", "-p", "k=v", "-C"]
+        )
+
+    def test_arg_order_kept(self):
+        assert Encoder._cache_key(["a=1", "b=2"]) != Encoder._cache_key(["b=2", "a=1"])
+
+
+class TestCacheStore:
+    def test_miss_then_hit(self, cache_dir):
+        cache = Cache()
+        assert cache.get("abc") is None
+
+        cache.put("abc", b"data")
+        assert cache.get("abc") == b"data"
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["entries"] == 1
+
+    def test_lru_eviction(self, cache_dir):
+        cache = Cache(max_bytes=8)
+        cache.put("old", b"1234")
+        cache.put("new", b"5678")
+        os.utime(os.path.join(cache.entries, "old"), ns=(0, 0))
+
+        # touching "old" on a hit makes "new" the least recently used
+        assert cache.get("old") == b"1234"
+        os.utime(os.path.join(cache.entries, "new"), ns=(1, 1))
+        cache.put("newest", b"9")
+
+        assert cache.get("new") is None
+        assert cache.get("old") == b"1234"
+        assert cache.get("newest") == b"9"
+        assert cache.stats()["bytes"] <= 8
+
+
+class TestEncodeCached:
+    def test_hit_returns_stored_output(self, cache_dir):
+        first = Encoder.encode(["-C", "k=v"])
+        second = Encoder.encode(["-C", "k=v"])
+        assert first == second == '{"k":"v"}'
+
+        stats = json.loads(Encoder.encode(["-S"]))
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+
+    def test_file_change_invalidates(self, cache_dir, tmp_path):
+        path = tmp_path / "value.txt"
+        path.write_text("first")
+        assert Encoder.encode(["-C", f"k=@{path}"]) == '{"k":"first"}'
+
+        path.write_text("second!")
+        assert Encoder.encode(["-C", f"k=@{path}"]) == '{"k":"second!"}'
+
+    def test_base_change_invalidates(self, cache_dir, tmp_path):
+        path = tmp_path / "base.json"
+        path.write_text('{"a":1}')
+        assert Encoder.encode(["-C", "-f", str(path), "b=2"]) == '{"a":1,"b":2}'
+
+        path.write_text('{"a":10}')
+        assert Encoder.encode(["-C", "-f", str(path), "b=2"]) == '{"a":10,"b":2}'
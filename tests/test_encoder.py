@@ -1,6 +1,8 @@
 from pjo.Encoder import Encoder
+from pjo.SharedReads import SharedReads
 import pytest
 import os
+import time
 
 
 class TestSplitArgOptions:
@@ -362,3 +364,140 @@ class Test_str_to_boolean:
 class Test_dummy:
     def test(self):
         assert True
+
+
+class TestEncodeMany:
+    def test_000(self):
+        records = [["k=v"], ["k=1", "k2=true"], ["-a", "1", "2"]]
+        assert Encoder.encode_many(records) == [
+            '{"k":"v"}',
+            '{"k":1,"k2":true}',
+            "[1,2]",
+        ]
+
+    def test_iterator(self):
+        records = (["n=" + str(i)] for i in range(3))
+        assert Encoder.encode_many(records) == ['{"n":0}', '{"n":1}', '{"n":2}']
+
+    def test_matches_encode(self):
+        records = [["-p", "k=v"], ["-B", "k=true"], ["k=[1,2]"]]
+        assert Encoder.encode_many(records) == [Encoder.encode(r) for r in records]
+
+    def test_workers_keep_order(self):
+        records = [["n=" + str(i)] for i in range(50)]
+        assert Encoder.encode_many(records, workers=4) == Encoder.encode_many(records)
+
+    def test_file_read_once(self, tmp_path, monkeypatch):
+        path = tmp_path / "value.txt"
+        path.write_text("someData")
+        reads = []
+        real_open = open
+
+        def counting_open(file, *args, **kwargs):
+            reads.append(file)
+            return real_open(file, *args, **kwargs)
+
+        monkeypatch.setattr("builtins.open", counting_open)
+        outputs = Encoder.encode_many([[f"k=@{path}", f"i={i}"] for i in range(5)])
+
+        assert outputs[4] == '{"k":"someData","i":4}'
+        assert reads == [str(path)]
+
+    def test_stream_rereads_changed_file(self, tmp_path):
+        path = tmp_path / "value.txt"
+        path.write_text("first")
+
+        def records():
+            yield [f"k=@{path}"]
+            path.write_text("second!")
+            yield [f"k=@{path}"]
+
+        assert list(Encoder.encode_stream(records())) == [
+            '{"k":"first"}',
+            '{"k":"second!"}',
+        ]
+
+    def test_stream_keeps_few_files(self, tmp_path):
+        files = SharedReads(size=2)
+        for i in range(5):
+            path = tmp_path / f"{i}.txt"
+            path.write_text(str(i))
+            assert files.get(("=@",), str(path), path.read_text) == str(i)
+        assert len(files._futures) == 2
+
+    def test_file_read_once_threads(self, tmp_path, monkeypatch):
+        path = tmp_path / "value.txt"
+        path.write_text("someData")
+        reads = []
+        real_open = open
+
+        def slow_open(file, *args, **kwargs):
+            # keep the first read going while the other threads ask for it
+            reads.append(file)
+            time.sleep(0.05)
+            return real_open(file, *args, **kwargs)
+
+        monkeypatch.setattr("builtins.open", slow_open)
+        records = [[f"k=@{path}", f"i={i}"] for i in range(40)]
+        outputs = Encoder.encode_many(records, workers=8)
+
+        assert outputs[39] == '{"k":"someData","i":39}'
+        assert reads == [str(path)]
+
+
+class TestBaseDocument:
+    def test_split_keeps_option_arg(self):
+        args, options, option_args = Encoder._split_args_options(
+            ["-f", "base.json", "k=v"]
+        )
+        assert args == [("k", "v")]
+        assert options == ["-f"]
+        assert option_args == {"-f": "base.json"}
+
+    def test_option_arg_is_not_a_flag(self):
+        args, options, option_args = Encoder._split_args_options(
+            ["-i", "-B", "-w", "k=true"]
+        )
+        assert options == ["-i", "-w"]
+        assert option_args == {"-i": "-B"}
+        assert Encoder.encode(["-i", "-B", "k=true"]) == '{"k":true}'
+
+    def test_missing_option_arg(self):
+        with pytest.raises(ValueError):
+            Encoder.split_args_options(["k=v", "-f"])
+
+    def test_add_and_override(self, tmp_path):
+        path = tmp_path / "base.json"
+        path.write_text('{"a":1,"b":{"c":2}}')
+        output = Encoder.encode(["-f", str(path), "a=2", "d=x"])
+        assert output == '{"a":2,"b":{"c":2},"d":"x"}'
+
+    def test_base_only(self, tmp_path):
+        path = tmp_path / "base.json"
+        path.write_text('{"a":1}')
+        assert Encoder.encode(["-f", str(path)]) == '{"a":1}'
+
+    def test_array(self, tmp_path):
+        path = tmp_path / "base.json"
+        path.write_text("[1,2]")
+        assert Encoder.encode(["-a", "-f", str(path), "3"]) == "[1,2,3]"
+
+    def test_wrong_type(self, tmp_path):
+        path = tmp_path / "base.json"
+        path.write_text("[1,2]")
+        with pytest.raises(ValueError):
+            Encoder.encode(["-f", str(path), "k=v"])
+
+    def test_empty(self, tmp_path):
+        path = tmp_path / "base.json"
+        path.write_text("")
+        with pytest.raises(ValueError):
+            Encoder.encode(["-f", str(path), "k=v"])
+
+    def test_batch_shares_base(self, tmp_path):
+        path = tmp_path / "base.json"
+        path.write_text('{"a":1}')
+        outputs = Encoder.encode_many(
+            [["-f", str(path), "b=1"], ["-f", str(path), "c=2"]]
+        )
+        assert outputs == ['{"a":1,"b":1}', '{"a":1,"c":2}']
@@ -0,0 +1,133 @@
+from pjo.Encoder import Encoder
+from pjo.Schema import Schema
+import pytest
+
+
+class TestClassify:
+    def test_000(self):
+        assert Schema._classify("1") == "int"
+        assert Schema._classify("-1") == "int"
+        assert Schema._classify("1.5") == "float"
+        assert Schema._classify("true") == "bool"
+        assert Schema._classify("x") == "string"
+        assert Schema._classify("{}") == "any"
+
+    def test_leading_zero_is_string(self):
+        assert Schema._classify("007") == "string"
+        assert Schema._classify("0") == "int"
+        assert Schema._classify("02.5") == "string"
+        assert Schema._classify("0.5") == "float"
+
+    def test_no_bool_detection(self):
+        assert Schema._classify("true", ["-B"]) == "string"
+        assert Schema._classify("null", ["-B"]) == "string"
+
+    def test_no_information(self):
+        assert Schema._classify("") is None
+        assert Schema._classify("null") is None
+
+
+class TestMerge:
+    def test_000(self):
+        assert Schema._merge(None, "int") == "int"
+        assert Schema._merge("int", "int") == "int"
+        assert Schema._merge("int", "float") == "float"
+        assert Schema._merge("int", "string") == "string"
+        assert Schema._merge("bool", "any") == "any"
+
+
+class TestSchema:
+    def test_unknown_type(self):
+        with pytest.raises(ValueError):
+            Schema({"k": "decimal"})
+
+    def test_learn(self):
+        schema = Schema(learn=2)
+        schema.observe([("zip", "12345"), ("n", "1"), ("x", "")])
+        schema.observe([("zip", "02134"), ("n", "2.5"), ("x", "")])
+        schema.freeze()
+        assert schema.types == {"zip": "string", "n": "float"}
+
+    def test_frozen(self):
+        schema = Schema({"k": "int"}, learn=0)
+        with pytest.raises(ValueError):
+            schema.observe([("k", "1")])
+
+    def test_convert_mismatch(self):
+        schema = Schema({"k": "int"}, learn=0)
+        infer = lambda value: Encoder._to_value(value, [])
+        assert schema.convert("k", "12", [], infer, 0) == 12
+        assert schema.convert("k", "null", [], infer, 1) is None
+        assert schema.convert("k", "abc", [], infer, 2) == "abc"
+        assert schema.mismatches == [
+            {"record": 2, "key": "k", "value": "abc", "expected": "int"}
+        ]
+
+
+class TestStabilizedBatch:
+    def test_learned_types(self):
+        records = [["zip=12345", "n=1"], ["zip=02134", "n=2"], ["zip=90210", "n=3"]]
+        outputs = Encoder.encode_many(records, schema=Schema(learn=2))
+        assert outputs == [
+            '{"zip":"12345","n":1}',
+            '{"zip":"02134","n":2}',
+            '{"zip":"90210","n":3}',
+        ]
+
+    def test_given_types_flag_mismatch(self):
+        schema = Schema({"id": "string", "n": "int"}, learn=0)
+        records = [["id=0", "n=1"], ["id=007", "n=x"]]
+        outputs = Encoder.encode_many(records, workers=2, schema=schema)
+        assert outputs == ['{"id":"0","n":1}', '{"id":"007","n":"x"}']
+        assert schema.mismatches == [
+            {"record": 1, "key": "n", "value": "x", "expected": "int"}
+        ]
+
+    def test_leading_zero_after_learned_int(self):
+        schema = Schema(learn=1)
+        outputs = Encoder.encode_many([["zip=12345"], ["zip=02134"]], schema=schema)
+        assert outputs == ['{"zip":12345}', '{"zip":2134}']
+        assert schema.mismatches == [
+            {"record": 1, "key": "zip", "value": "02134", "expected": "int"}
+        ]
+
+    def test_leading_zero_given_float(self):
+        schema = Schema({"n": "float"}, learn=0)
+        infer = lambda value: Encoder._to_value(value, [])
+        assert schema.convert("n", "0.5", [], infer, 0) == 0.5
+        schema.convert("n", "007", [], infer, 1)
+        assert [m["value"] for m in schema.mismatches] == ["007"]
+
+    def test_no_bool_detection(self):
+        records = [["-B", "k=true"], ["-B", "k=false"]]
+        outputs = Encoder.encode_many(records, schema=Schema(learn=2))
+        assert outputs == [Encoder.encode(r) for r in records]
+        assert outputs == ['{"k":"true"}', '{"k":"false"}']
+
+    def test_no_bool_detection_given_type(self):
+        schema = Schema({"k": "bool"}, learn=0)
+        outputs = Encoder.encode_many([["-B", "k=true"]], schema=schema)
+        assert outputs == ['{"k":"true"}']
+        assert schema.mismatches == [
+            {"record": 0, "key": "k", "value": "true", "expected": "bool"}
+        ]
+
+    def test_nested_value_for_string_key(self):
+        schema = Schema(learn=1)
+        outputs = Encoder.encode_many([["k=a"], ['k={"a":1}']], schema=schema)
+        assert outputs == ['{"k":"a"}', '{"k":{"a":1}}']
+        assert schema.mismatches == [
+            {"record": 1, "key": "k", "value": '{"a":1}', "expected": "string"}
+        ]
+
+    def test_learning_skips_early_records(self):
+        records = [["-v"], ["k=1"]]
+        assert Encoder.encode_many(records, schema=Schema(learn=2)) == [
+            Encoder.VERSION,
+            '{"k":1}',
+        ]
+
+    def test_stream(self):
+        records = (["n=" + str(i)] for i in range(5))
+        stream = Encoder.encode_stream(records, workers=2, schema=Schema(learn=3))
+        assert list(stream) == ['{"n":' + str(i) + "}" for i in range(5)]
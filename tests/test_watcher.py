@@ -0,0 +1,106 @@
+from pjo.Encoder import Encoder
+from pjo.Watcher import Watcher, _Inotify
+import os
+import pytest
+
+
+def touch_later(path, text):
+    # make sure the change is visible even on coarse mtime filesystems
+    path.write_text(text)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+
+class TestWatcher:
+    def test_render_matches_encode(self, tmp_path):
+        path = tmp_path / "value.txt"
+        path.write_text("someData")
+        input = [f"a=@{path}", "n=1", "a2=[1,2]", "b=true"]
+        assert Watcher(input).render() == Encoder.encode(input)
+
+    def test_poll_rereads_changed_file_only(self, tmp_path):
+        first = tmp_path / "first.txt"
+        second = tmp_path / "second.txt"
+        first.write_text("1")
+        second.write_text("2")
+        watcher = Watcher([f"a=@{first}", f"b=@{second}", "c=x"])
+        assert watcher.poll() == False
+
+        cached = watcher.fragments[1]
+        touch_later(first, "one")
+        assert watcher.poll()
+        assert watcher.render() == '{"a":"one","b":2,"c":"x"}'
+        assert watcher.fragments[1] is cached
+
+    def test_file_appears(self, tmp_path):
+        path = tmp_path / "later.txt"
+        watcher = Watcher([f"k=@{path}"])
+        assert watcher.render() == '{"k":"%s"}' % path
+
+        path.write_text("here")
+        assert watcher.poll()
+        assert watcher.render() == '{"k":"here"}'
+
+    def test_base_change(self, tmp_path):
+        path = tmp_path / "base.json"
+        path.write_text('{"a":1,"b":1}')
+        watcher = Watcher(["-f", str(path), "b=2"])
+        assert watcher.render() == '{"a":1,"b":2}'
+
+        touch_later(path, '{"a":10,"b":1,"c":3}')
+        assert watcher.poll()
+        assert watcher.render() == '{"a":10,"b":2,"c":3}'
+
+    def test_base_half_written(self, tmp_path):
+        path = tmp_path / "base.json"
+        path.write_text('{"a":1}')
+        watcher = Watcher(["-f", str(path), "b=2"])
+
+        touch_later(path, "")
+        assert watcher.poll() == False
+        assert watcher.render() == '{"a":1,"b":2}'
+
+        touch_later(path, '{"a":3}')
+        assert watcher.poll()
+        assert watcher.render() == '{"a":3,"b":2}'
+
+    def test_json_file_half_written(self, tmp_path):
+        path = tmp_path / "nested.json"
+        path.write_text('{"x":1}')
+        watcher = Watcher([f"k=:{path}"])
+
+        signature = watcher.signatures[str(path)]
+        touch_later(path, '{"x":')
+        assert watcher.poll() == False
+        assert watcher.render() == '{"k":{"x":1}}'
+        # the old signature stays, so the next poll tries again
+        assert watcher.signatures[str(path)] == signature
+
+        touch_later(path, '{"x":2}')
+        assert watcher.poll()
+        assert watcher.render() == '{"k":{"x":2}}'
+
+    def test_pretty(self, tmp_path):
+        input = ["-p", "k=v", "n=1"]
+        assert Watcher(input).render() == Encoder.encode(input)
+
+    def test_write_atomic(self, tmp_path):
+        output = tmp_path / "out.json"
+        Watcher(["-o", str(output), "k=v"]).write()
+        assert output.read_text() == '{"k":"v"}\n'
+        assert os.listdir(tmp_path) == ["out.json"]
+
+    def test_bad_interval(self):
+        with pytest.raises(ValueError):
+            Watcher(["-i", "0", "k=v"])
+
+    def test_inotify_wakes_up(self, tmp_path):
+        path = tmp_path / "value.txt"
+        path.write_text("1")
+        inotify = _Inotify.create([str(path)])
+        if inotify is None:
+            pytest.skip("inotify not available")
+
+        path.write_text("2")
+        assert inotify.wait(5)
+        inotify.close()